@@ -0,0 +1,59 @@
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("google.adk")
+pytest.importorskip("pymongo")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "user_question_answer"))
+import agent  # noqa: E402
+
+
+class _FakeIdCollection:
+    """Just enough of a collection to evaluate _seed_counter's aggregation"""
+
+    def __init__(self, field, ids):
+        self.docs = [{field: value} for value in ids]
+
+    def aggregate(self, pipeline):
+        (field, cond), = pipeline[0]["$match"].items()
+        pattern = re.compile(cond["$regex"])
+        source, start, _ = pipeline[1]["$group"]["max"]["$max"]["$toLong"]["$substrCP"]
+        assert source == f"${field}"
+        nums = [int(doc[field][start:]) for doc in self.docs if field in doc and pattern.search(doc[field])]
+        return iter([{"_id": None, "max": max(nums)}] if nums else [])
+
+
+class _FakeCounters:
+    def __init__(self):
+        self.seq = {}
+
+    def update_one(self, filter_query, update, upsert=False):
+        key = filter_query["_id"]
+        self.seq[key] = max(self.seq.get(key, 0), update["$max"]["seq"])
+
+    def find_one_and_update(self, filter_query, update, **kwargs):
+        key = filter_query["_id"]
+        self.seq[key] = self.seq.get(key, 0) + update["$inc"]["seq"]
+        return {"seq": self.seq[key]}
+
+
+class _FakeDb:
+    def __init__(self):
+        self.counters = _FakeCounters()
+
+
+@pytest.mark.parametrize("collection, prefix, existing, expected", [
+    ("products", "P", ["P001", "P002", "P010", "Pxyz"], ["P011", "P012"]),
+    ("suppliers", "S", ["S001", "S003"], ["S004", "S005"]),
+    ("orders", "O", ["O999", "O1001"], ["O1002", "O1003"]),
+])
+def test_reserved_ids_continue_after_existing_ids(monkeypatch, collection, prefix, existing, expected):
+    fake = _FakeIdCollection(agent._ID_FIELDS[collection], existing)
+    monkeypatch.setattr(agent, "_COLLECTIONS", {**agent._COLLECTIONS, collection: fake})
+    monkeypatch.setattr(agent, "_db", _FakeDb())
+    monkeypatch.setattr(agent, "_seeded_counters", set())
+
+    assert agent._reserve_ids(collection, prefix, 2) == expected
@@ -1,12 +1,35 @@
 # agent.py (single file)
 
 from google.adk.agents import Agent
-from google.adk.tools import FunctionTool, load_memory, preload_memory
-from datetime import datetime
+from google.adk.tools import FunctionTool, load_memory
+try:
+    from google.adk.apps import App
+    from google.adk.agents.context_cache_config import ContextCacheConfig
+except ImportError:  # ADK releases without context caching
+    App = None
+from datetime import datetime, timedelta
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import re
+import threading
 import time
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+try:
+    import orjson
+except ImportError:  # Optional speedup; the stdlib json fallback gives the same keys
+    orjson = None
 try:
-    from pymongo import MongoClient
+    from pymongo import MongoClient, ReturnDocument, UpdateOne, WriteConcern
+    from pymongo.errors import BulkWriteError, OperationFailure
     from bson import ObjectId
+    from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
 except Exception as e:
     raise ImportError(
         "pymongo is not installed or cannot be imported. Install it with: "
@@ -15,27 +38,725 @@ except Exception as e:
 
 import smtplib
 import ssl
+from email.message import EmailMessage
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+_log = logging.getLogger(__name__)
+
 
 # ======================================
 # MONGODB CONNECTION
 # ======================================
 
-# Connect to MongoDB
-_client = MongoClient("mongodb://localhost:27017")
-_db = _client["user_db"]
+class _ObjectIdAsString(TypeDecoder):
+    """Decode ObjectId values straight to str so results are JSON-ready"""
+    bson_type = ObjectId
+
+    def transform_bson(self, value):
+        return str(value)
+
+
+# One process-wide client; every tool call borrows a pooled connection from it.
+# It connects lazily, on the first operation. Compressors are tried in order;
+# zlib ships with Python so it is always available.
+_MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+_client = MongoClient(
+    _MONGO_URI,
+    maxPoolSize=50,
+    minPoolSize=5,
+    compressors="zlib",
+    retryWrites=True,
+    appname="user_qa_agent",
+    serverSelectionTimeoutMS=3000
+)
+_db = _client.get_database(
+    "user_db",
+    codec_options=CodecOptions(type_registry=TypeRegistry([_ObjectIdAsString()]))
+)
+
+# Write concern for update/delete: the server only acknowledges once the
+# write is journaled on a majority of nodes
+_DURABLE = WriteConcern(w="majority", j=True)
+
+_VALID = frozenset({'products', 'suppliers', 'orders'})
+_VALID_MSG = "Invalid collection. Available: products, suppliers, orders"
+
+# Collection handles are built once and shared by all tools
+_COLLECTIONS = {name: _db[name] for name in _VALID}
+_DURABLE_COLLECTIONS = {name: col.with_options(write_concern=_DURABLE) for name, col in _COLLECTIONS.items()}
+
+# Field that uniquely identifies a document in each collection
+_ID_FIELDS = {'products': 'product_id', 'suppliers': 'supplier_id', 'orders': 'order_id'}
+
+# Fields db_access returns when the caller gives no projection: what answers
+# usually need, keeping results (and the tokens fed back to the model) small.
+# They must include the ID field, which the lookup batcher keys results on.
+_DEFAULT_PROJECTIONS = {
+    'products': {"product_id": 1, "product_name": 1, "category": 1, "price": 1,
+                 "stock_count": 1, "rating": 1, "supplier": 1, "_id": 0},
+    'suppliers': {"supplier_id": 1, "supplier_name": 1, "contact_email": 1,
+                  "contact_number": 1, "address": 1, "rating": 1, "_id": 0},
+    'orders': {"order_id": 1, "product_id": 1, "quantity": 1, "total_price": 1,
+               "order_date": 1, "customer_name": 1, "_id": 0},
+}
+
+
+def _is_single_target(collection: str, query: dict) -> bool:
+    """True when the filter pins one document by _id or the collection's ID field"""
+    if len(query) != 1:
+        return False
+    key, value = next(iter(query.items()))
+    return key in ('_id', _ID_FIELDS.get(collection)) and not isinstance(value, (dict, list))
+
+
+def _with_derived_fields(collection: str, fields: dict) -> dict:
+    """Add fields derived from `fields` (address_lower, kept in sync with address)"""
+    if collection == 'suppliers' and isinstance(fields.get('address'), str):
+        return {**fields, 'address_lower': fields['address'].lower()}
+    return fields
+
+
+def _rewrite_address_regex(collection: str, query: dict) -> dict:
+    """
+    Case-insensitive regexes can't use a B-tree index. Rewrite
+    {'address': {'$regex': p, '$options': 'i'}} on suppliers into a case-sensitive
+    regex on the lowercased copy, which can (a '^' anchor gives a bounded range scan).
+    Patterns with backslash escapes are left alone, since lowercasing would change
+    their meaning (\\D is not \\d).
+    """
+    cond = query.get('address') if collection == 'suppliers' else None
+    if not isinstance(cond, dict) or set(cond) != {'$regex', '$options'} or cond['$options'] != 'i':
+        return query
+    pattern = cond['$regex']
+    if not isinstance(pattern, str) or '\\' in pattern or not _address_lower_ready:
+        return query
+    rewritten = {k: v for k, v in query.items() if k not in ('address', '$or')}
+    # Documents written by other clients may lack address_lower; both branches
+    # can use the address_lower index ($exists: false matches its null keys)
+    branches = [
+        {'address_lower': {'$regex': pattern.lower()}},
+        {'address_lower': {'$exists': False}, 'address': cond},
+    ]
+    if '$or' in query:
+        rewritten['$and'] = rewritten.get('$and', []) + [{'$or': query['$or']}, {'$or': branches}]
+    else:
+        rewritten['$or'] = branches
+    return rewritten
+
+
+def _rewrite_text_search(collection: str, query: dict) -> dict:
+    """
+    `$text` needs the address text index; until it exists (index creation runs in
+    the background, and may fail) answer the search with a case-insensitive regex
+    matching any of its words instead.
+    """
+    text = query.get('$text')
+    if collection != 'suppliers' or not isinstance(text, dict) or _has_index('suppliers', ('address', 'text')):
+        return query
+    words = str(text.get('$search', '')).split()
+    if not words:
+        return query
+    rewritten = {k: v for k, v in query.items() if k != '$text'}
+    rewritten['address'] = {'$regex': '|'.join(re.escape(word) for word in words), '$options': 'i'}
+    return rewritten
+
+
+def _normalize_id_filter(filter_query: dict) -> None:
+    """Convert a string _id in a filter to ObjectId in place, if needed"""
+    oid = filter_query.get('_id')
+    # is_valid is a cheap check; non-ObjectId strings are left as is
+    if isinstance(oid, str) and ObjectId.is_valid(oid):
+        filter_query['_id'] = ObjectId(oid)
+
+
+_INDEX_OPTIONS_CONFLICT = 85
+_DUPLICATE_KEY = 11000
+
+
+def _ensure_unique_index(col, field: str) -> None:
+    """
+    Create a unique index on `field`. An existing non-unique index is kept as is
+    (never dropped), and if the data already holds duplicate IDs a non-unique
+    index is created instead, so lookups stay indexed either way.
+    """
+    try:
+        col.create_index([(field, 1)], unique=True)
+    except OperationFailure as e:
+        if e.code == _INDEX_OPTIONS_CONFLICT:
+            _log.warning("%s.%s is already indexed without unique; leaving it in place", col.name, field)
+        elif e.code == _DUPLICATE_KEY:
+            _log.warning("%s.%s has duplicate values; creating a non-unique index: %s", col.name, field, e)
+            col.create_index([(field, 1)])
+        else:
+            raise
+
+
+# (collection, keys, unique) for the fields the tools and prompt examples query on
+_INDEX_SPECS = [
+    ("products", [("product_id", 1)], True),
+    ("products", [("product_name", 1)], False),
+    ("products", [("supplier", 1)], False),
+    ("products", [("category", 1), ("price", 1)], False),
+    ("products", [("rating", -1)], False),
+    ("suppliers", [("supplier_id", 1)], True),
+    ("suppliers", [("supplier_name", 1)], False),
+    ("suppliers", [("rating", 1)], False),
+    ("suppliers", [("address", "text")], False),
+    ("suppliers", [("address_lower", 1)], False),
+    ("orders", [("order_id", 1)], False),
+    ("orders", [("product_id", 1)], False),
+    ("orders", [("order_date", 1)], False),
+    ("orders", [("customer_name", 1)], False),
+]
+
+# (collection, keys) of indexes known to exist; filled in by _bootstrap.
+# Hints and $text are only used once their index is here, since the server
+# rejects both without it.
+_ready_indexes = set()
+
+
+def _has_index(collection: str, *keys) -> bool:
+    return (collection, keys) in _ready_indexes
+
+
+def _ensure_indexes() -> None:
+    """Create the indexes in _INDEX_SPECS (idempotent); each one independently, so one failure doesn't skip the rest"""
+    for collection, keys, unique in _INDEX_SPECS:
+        try:
+            if unique:
+                _ensure_unique_index(_db[collection], keys[0][0])
+            else:
+                _db[collection].create_index(keys)
+            _ready_indexes.add((collection, tuple(keys)))
+        except Exception as e:
+            _log.warning("Could not create index %s on %s: %s", keys, collection, e)
+
+
+# address_lower is written with Python's str.lower() everywhere (MongoDB's
+# $toLower only folds ASCII). Until the backfill below has run, stored values
+# may be missing or ASCII-only, so address regexes aren't rewritten to it.
+_address_lower_ready = False
+
+
+def _backfill_address_lower() -> None:
+    """Migration: give every supplier an address_lower matching str.lower(), fixing missing or stale copies"""
+    global _address_lower_ready
+    # Default codec options: _db decodes ObjectIds to strings, which wouldn't
+    # match the stored _id in the updates below
+    suppliers = _client["user_db"].suppliers
+    batch, unmatched = [], 0
+    
+    def flush():
+        nonlocal unmatched
+        result = suppliers.bulk_write(batch, ordered=False)
+        unmatched += len(batch) - result.matched_count
+        batch.clear()
+    
+    for doc in suppliers.find({"address": {"$type": "string"}}, {"address": 1, "address_lower": 1}):
+        lowered = doc["address"].lower()
+        if doc.get("address_lower") != lowered:
+            batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"address_lower": lowered}}))
+        if len(batch) >= 1000:
+            flush()
+    if batch:
+        flush()
+    
+    if unmatched:
+        # Deleted mid-scan, or the updates aren't landing; keep regexes on address
+        _log.warning("address_lower backfill: %d supplier update(s) matched nothing", unmatched)
+    else:
+        _address_lower_ready = True
+
+
+def _bootstrap() -> None:
+    """
+    Startup work that needs the server, run in a background thread so importing
+    the agent doesn't wait on MongoDB: create indexes, run the address
+    migration, build the product index and open pooled connections with a
+    cheap read per collection.
+    """
+    _ensure_indexes()
+    
+    try:
+        _backfill_address_lower()
+    except Exception:
+        pass  # Retried on the next start; address regexes keep running on address until then
+    
+    _product_index.refresh()
+    
+    for name, col in _COLLECTIONS.items():
+        try:
+            col.find_one({}, _DEFAULT_PROJECTIONS[name])
+        except Exception:
+            pass  # Warmup only; the first real query connects on demand
+
+
+# ======================================
+# ASYNC TOOL WRAPPER
+# ======================================
+
+def _run_in_thread(func):
+    """Expose a blocking tool as a coroutine so ADK can overlap concurrent tool calls"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
 
 
 # ======================================
 # CUSTOM MONGODB TOOL
 # ======================================
 
-def db_access(collection: str, query: dict) -> list:
+def _find(collection: str, query: dict, projection: dict, limit: int) -> list:
+    """Blocking query behind db_access"""
+    col = _COLLECTIONS[collection]
+    if projection is None:
+        projection = _DEFAULT_PROJECTIONS.get(collection)
+    
+    # Lookup by unique ID: find_one stops at the first match, and the hint pins
+    # the ID index (only when it is known to exist, otherwise the server rejects it)
+    if _is_single_target(collection, query):
+        key = next(iter(query))
+        hint = [(key, 1)] if key == '_id' or _has_index(collection, (key, 1)) else None
+        doc = col.find_one(query, projection, hint=hint)
+        return [doc] if doc else []
+    
+    limit = max(1, min(limit, 100))
+    # batch_size matches the limit so the whole result comes back in one batch;
+    # ObjectIds are decoded to strings by the database codec options
+    return list(col.find(query, projection=projection).limit(limit).batch_size(limit))
+
+
+def _find_by_ids(collection: str, field: str, values: list) -> dict:
+    """Blocking `$in` lookup on an ID field, returning {id value: document}"""
+    hint = [(field, 1)] if _has_index(collection, (field, 1)) else None
+    docs = {}
+    for doc in _COLLECTIONS[collection].find({field: {"$in": values}}, _DEFAULT_PROJECTIONS[collection], hint=hint):
+        docs.setdefault(doc.get(field), doc)
+    return docs
+
+
+class _LookupBatcher:
+    """
+    Coalesce concurrent unique-ID lookups (e.g. several product_id lookups issued
+    as parallel tool calls) into one indexed `$in` query per collection and field.
+    """
+
+    def __init__(self, max_batch: int = 16, max_wait_ms: float = 5):
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000
+        self._pending = {}  # (loop, collection, field) -> [(value, future), ...]
+        self._tasks = set()  # strong references so running flushes aren't garbage collected
+
+    async def get(self, collection: str, field: str, value):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Keyed by loop: a batch left pending when an earlier loop closed would
+        # never be flushed, and its futures belong to that loop anyway
+        group = (loop, collection, field)
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = []
+            loop.call_later(self._max_wait, self._flush, group)
+        batch.append((value, future))
+        if len(batch) >= self._max_batch:
+            self._flush(group)
+        return await future
+
+    def _flush(self, group) -> None:
+        # The timer may fire after a size-triggered flush; then there is nothing to do
+        batch = self._pending.pop(group, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(group, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group, batch) -> None:
+        _, collection, field = group
+        try:
+            docs = await asyncio.to_thread(_find_by_ids, collection, field, list({v for v, _ in batch}))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for value, future in batch:
+            if not future.done():
+                future.set_result(docs.get(value))
+
+
+_lookup_batcher = _LookupBatcher()
+
+
+class _QueryCache:
+    """
+    Bounded LRU of db_access results with a TTL. Writes invalidate a whole
+    collection and bump its generation, so a read that was in flight during the
+    write cannot store its (possibly stale) result afterwards.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 60):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._generations = {}  # collection -> write count
+        self._lock = threading.Lock()  # write tools invalidate from worker threads
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def generation(self, collection: str) -> int:
+        with self._lock:
+            return self._generations.get(collection, 0)
+
+    def set(self, key, result, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self._ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def clear_collection(self, collection: str) -> None:
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+            for key in [k for k in self._entries if k[0] == collection]:
+                del self._entries[key]
+
+
+_query_cache = _QueryCache()
+
+
+class _ProductIndex:
+    """
+    In-memory copy of the products collection (default projection), keyed by
+    exact product_name and supplier, so the two most common lookups skip
+    MongoDB. Built once in a background thread and then kept up to date write
+    by write: inserts add their documents, and writes whose filter names the
+    product_ids they touch re-read just those products. Only writes that could
+    touch any product (e.g. an update by category) trigger a full rebuild.
+    While a write is being applied, or when the copy is older than max_age,
+    lookups fall through to MongoDB.
+    """
+
+    FIELDS = ('product_name', 'supplier')
+
+    def __init__(self, max_docs: int = 50000, max_age: float = 300):
+        self._max_docs = max_docs  # Past this the collection is too big to mirror
+        self._max_age = max_age  # Also rebuild periodically to pick up writes made elsewhere
+        self._index = None  # 'product_id' -> {id: [documents]}, field -> {value: [documents]}
+        self._built_at = 0.0
+        self._generation = 0  # Bumped by every write, so an overlapping build is redone
+        self._building = False
+        self._pending = 0  # Writes not yet applied to the index
+        self._retry_at = 0.0  # Back off after a failed or skipped build
+        self._lock = threading.Lock()
+        self._patch_lock = threading.Lock()  # Re-reads apply in order, so the last one wins
+
+    def lookup(self, query: dict, limit: int):
+        """Documents for a `{field: value}` equality query, or None if it must go to MongoDB"""
+        if len(query) != 1:
+            return None
+        field, value = next(iter(query.items()))
+        if field not in self.FIELDS or not isinstance(value, str):
+            return None
+        with self._lock:
+            stale = self._index is None or time.monotonic() - self._built_at > self._max_age
+            if not stale and not self._pending:
+                return list(self._index[field].get(value, ()))[:max(1, min(limit, 100))]
+        if stale:
+            self.refresh()
+        return None
+
+    def add(self, docs: list) -> None:
+        """Write-through for inserted products"""
+        projection = _DEFAULT_PROJECTIONS['products']
+        with self._lock:
+            self._generation += 1
+            if self._index is not None:
+                for doc in docs:
+                    self._put(self._index, {k: v for k, v in doc.items() if projection.get(k)})
+
+    def changed(self, product_ids) -> None:
+        """Re-read the given products in the background; None means any product may have changed"""
+        if product_ids is None:
+            self.invalidate()
+            return
+        if not product_ids:
+            return
+        with self._lock:
+            self._generation += 1
+            self._pending += 1
+        threading.Thread(target=self._patch, args=(list(product_ids),), name="product-index-patch", daemon=True).start()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+            self._generation += 1
+            self._retry_at = 0.0
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Start a background rebuild unless one is already running"""
+        with self._lock:
+            if self._building or time.monotonic() < self._retry_at:
+                return
+            self._building = True
+        threading.Thread(target=self._build, name="product-index", daemon=True).start()
+
+    @classmethod
+    def _put(cls, index: dict, doc: dict) -> None:
+        index['product_id'].setdefault(doc.get('product_id'), []).append(doc)
+        for field in cls.FIELDS:
+            value = doc.get(field)
+            if isinstance(value, str):
+                index[field].setdefault(value, []).append(doc)
+
+    @classmethod
+    def _drop(cls, index: dict, product_id: str) -> None:
+        for doc in index['product_id'].pop(product_id, ()):
+            for field in cls.FIELDS:
+                value = doc.get(field)
+                remaining = [d for d in index[field].get(value, ()) if d is not doc]
+                if remaining:
+                    index[field][value] = remaining
+                else:
+                    index[field].pop(value, None)
+
+    def _patch(self, product_ids: list) -> None:
+        try:
+            with self._patch_lock:
+                # Read after the write completed, so this sees it (or something newer)
+                docs = list(_db.products.find({'product_id': {'$in': product_ids}}, _DEFAULT_PROJECTIONS['products']))
+                with self._lock:
+                    if self._index is not None:
+                        for product_id in product_ids:
+                            self._drop(self._index, product_id)
+                        for doc in docs:
+                            self._put(self._index, doc)
+        except Exception:
+            self.invalidate()  # Couldn't re-read; fall back to a full rebuild
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _build(self) -> None:
+        try:
+            while True:
+                with self._lock:
+                    generation = self._generation
+                index = self._load()
+                with self._lock:
+                    if generation == self._generation:
+                        if index is None:
+                            self._retry_at = time.monotonic() + self._max_age
+                        else:
+                            self._index = index
+                            self._built_at = time.monotonic()
+                        return
+                # A write landed mid-build; load again so it is included
+        except Exception:
+            # Server unreachable; lookups keep going to MongoDB until a later retry
+            with self._lock:
+                self._retry_at = time.monotonic() + self._max_age
+        finally:
+            with self._lock:
+                self._building = False
+
+    def _load(self):
+        products = _db.products
+        if products.estimated_document_count() > self._max_docs:
+            return None
+        index = {field: {} for field in ('product_id',) + self.FIELDS}
+        for doc in products.find({}, _DEFAULT_PROJECTIONS['products']):
+            self._put(index, doc)
+        return index
+
+
+def _product_ids_in(filter_query):
+    """The product_ids a filter is limited to, or None if it can match any product"""
+    value = filter_query.get('product_id') if isinstance(filter_query, dict) else None
+    if isinstance(value, str):
+        return {value}
+    if isinstance(value, dict) and set(value) == {'$in'} and all(isinstance(v, str) for v in value['$in']):
+        return set(value['$in'])
+    return None
+
+
+def _written_product_ids(arguments: dict):
+    """
+    product_ids a filter-based write tool may have changed (including any new
+    product_id it set), or None if it could have touched any product. Inserts
+    maintain the product index themselves.
+    """
+    if 'filter_query' in arguments:
+        writes = [(arguments['filter_query'], arguments.get('update_data'))]
+    elif 'ops' in arguments:
+        writes = [(op.get('filter'), op.get('update')) for op in arguments['ops'] or () if isinstance(op, dict)]
+    else:
+        return set()
+    ids = set()
+    for filter_query, update in writes:
+        matched = _product_ids_in(filter_query)
+        if matched is None:
+            return None
+        ids |= matched
+        if isinstance(update, dict) and isinstance(update.get('product_id'), str):
+            ids.add(update['product_id'])
+    return ids
+
+
+_product_index = _ProductIndex()
+
+threading.Thread(target=_bootstrap, name="mongo-bootstrap", daemon=True).start()
+
+
+def _canonical(obj) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()
+        except (TypeError, orjson.JSONEncodeError):
+            pass  # e.g. integers beyond 64 bits, which json handles
+    return json.dumps(obj, sort_keys=True, default=str)
+
+
+def _cache_key(collection: str, query: dict, projection: dict, limit: int) -> tuple:
+    """Canonical key: key order in the query/projection doesn't matter"""
+    return (collection, _canonical(query), _canonical(projection), limit)
+
+
+def _invalidates_cache(func):
+    """Drop cached db_access results for the collection a write tool touched, and keep the product index current"""
+    signature = inspect.signature(func)
+    
+    @functools.wraps(func)
+    def wrapper(collection, *args, **kwargs):
+        try:
+            return func(collection, *args, **kwargs)
+        finally:
+            _query_cache.clear_collection(collection)
+            if collection == 'products':
+                try:
+                    arguments = signature.bind_partial(collection, *args, **kwargs).arguments
+                except TypeError:
+                    pass  # Bad arguments: the tool raised before writing anything
+                else:
+                    _product_index.changed(_written_product_ids(arguments))
+    return wrapper
+
+
+async def _query(collection: str, query: dict, projection: dict, limit: int) -> list:
+    """Run a db_access query, batching unique-ID lookups"""
+    # product_id/supplier_id/order_id lookups with the default projection go through
+    # the batcher; _id is excluded because results carry it as a string, not an ObjectId
+    if projection is None and _is_single_target(collection, query):
+        field, value = next(iter(query.items()))
+        if field != '_id':
+            doc = await _lookup_batcher.get(collection, field, value)
+            return [doc] if doc else []
+    
+    return await asyncio.to_thread(_find, collection, query, projection, limit)
+
+
+# Single-flight: concurrent misses for the same cache key share one query
+# instead of each going to MongoDB. Flights are keyed by the collection's write
+# generation too, so a read issued after a write never joins a query that
+# started before it.
+_inflight = {}
+
+
+async def _fill_cache(key: tuple, generation: int, collection: str, query: dict, projection: dict, limit: int) -> list:
+    result = await _query(collection, query, projection, limit)
+    _query_cache.set(key, result, generation)
+    return result
+
+
+async def _cached_query(collection: str, query: dict, projection: dict = None, limit: int = 25):
+    """Serve a query from _query_cache, running it on a miss; returns (result, was_cached)"""
+    key = _cache_key(collection, query, projection, limit)
+    cached = _query_cache.get(key)
+    if cached is not None:
+        return cached, True
+    
+    generation = _query_cache.generation(collection)
+    flight_key = (key, generation)
+    flight = _inflight.get(flight_key)
+    if flight is not None:
+        # Someone else is already fetching this; their result counts as cached
+        return await asyncio.shield(flight), True
+    
+    flight = asyncio.ensure_future(_fill_cache(key, generation, collection, query, projection, limit))
+    _inflight[flight_key] = flight
+    flight.add_done_callback(lambda f: _inflight.pop(flight_key, None) if _inflight.get(flight_key) is f else None)
+    # shield() so a cancelled caller doesn't cancel the query other callers are waiting on
+    return await asyncio.shield(flight), False
+
+
+# Predictive prefetch: after a fresh lookup, warm the cache with the follow-up
+# queries the agent is likely to issue next (same shape as its own calls, so
+# the cache keys match). Bounded so prefetching can't crowd out real queries.
+_PREFETCH_DOCS = 3
+_PREFETCH_CONCURRENCY = 4
+_prefetch_slots = weakref.WeakKeyDictionary()  # event loop -> Semaphore
+_prefetch_tasks = set()
+
+
+def _prefetch_slots_for_loop() -> asyncio.Semaphore:
+    """The running loop's prefetch semaphore (asyncio primitives are bound to one loop)"""
+    loop = asyncio.get_running_loop()
+    slots = _prefetch_slots.get(loop)
+    if slots is None:
+        slots = _prefetch_slots[loop] = asyncio.Semaphore(_PREFETCH_CONCURRENCY)
+    return slots
+
+
+def _related_queries(collection: str, docs: list) -> list:
+    """(collection, query) pairs likely to follow a lookup that returned `docs`"""
+    related = []
+    for doc in docs[:_PREFETCH_DOCS]:
+        if collection == 'products':
+            if doc.get('supplier'):
+                related.append(('suppliers', {'supplier_name': doc['supplier']}))
+            if doc.get('product_id'):
+                related.append(('orders', {'product_id': doc['product_id']}))
+        elif collection == 'suppliers':
+            if doc.get('supplier_name'):
+                related.append(('products', {'supplier': doc['supplier_name']}))
+        elif collection == 'orders':
+            if doc.get('product_id'):
+                related.append(('products', {'product_id': doc['product_id']}))
+    return related
+
+
+async def _prefetch(collection: str, query: dict) -> None:
+    try:
+        async with _prefetch_slots_for_loop():
+            await _cached_query(collection, query)
+    except Exception:
+        pass  # Best effort: a failed prefetch just means a later cache miss
+
+
+def _schedule_prefetch(collection: str, docs: list) -> None:
+    for related_collection, related_query in _related_queries(collection, docs):
+        task = asyncio.ensure_future(_prefetch(related_collection, related_query))
+        _prefetch_tasks.add(task)
+        task.add_done_callback(_prefetch_tasks.discard)
+
+
+async def db_access(collection: str, query: dict, projection: dict = None, limit: int = 25) -> list:
     """
     Execute MongoDB queries and return JSON results.
     
@@ -49,17 +770,35 @@ def db_access(collection: str, query: dict) -> list:
                - Products: {'product_name': 'Smart Watch'} or {'category': 'Electronics', 'price': {'$lt': 2000}}
                - Suppliers: {'supplier_name': 'Sony'} or {'rating': {'$gte': 4.5}}
                - Orders: {'order_id': 'O1001'} or {'customer_name': 'Rakesh'}
+        projection: Optional fields to return, e.g. {'product_name': 1, 'price': 1, '_id': 0}.
+                    Omit for the common fields of the collection (IDs, names, prices,
+                    ratings, contacts); pass {'_id': 0} to get every field.
+        limit: Maximum number of documents to return (1-100, default 25).
+               Pass the smallest number that answers the question, e.g. 1 for a single product.
     
     Returns:
-        A list of matching documents as JSON objects.
+        A list of matching documents as JSON objects, or an error dictionary if
+        the server rejects the query.
     """
-    col = _db[collection]
-    result = list(col.find(query).limit(100))
+    if collection not in _VALID:
+        return []
     
-    # Convert ObjectId to string
-    for r in result:
-        r["_id"] = str(r["_id"])
+    query = _rewrite_address_regex(collection, _rewrite_text_search(collection, query))
+    _normalize_id_filter(query)
     
+    if collection == 'products' and projection is None:
+        indexed = _product_index.lookup(query, limit)
+        if indexed is not None:
+            if indexed:
+                _schedule_prefetch(collection, indexed)
+            return indexed
+    
+    try:
+        result, was_cached = await _cached_query(collection, query, projection, limit)
+    except OperationFailure as e:
+        return {"error": True, "message": f"Query failed: {str(e)}"}
+    if not was_cached and result:
+        _schedule_prefetch(collection, result)
     return result
 
 db_tool = FunctionTool(
@@ -68,23 +807,239 @@ db_tool = FunctionTool(
 )
 
 
+# ======================================
+# TYPED QUERY TOOLS
+# ======================================
+
+# Common lookups as typed parameters: the model fills in plain fields instead
+# of writing a MongoDB filter, and the filter is built here.
+
+def _range(low, high) -> dict:
+    bounds = {}
+    if low is not None:
+        bounds['$gte'] = low
+    if high is not None:
+        bounds['$lte'] = high
+    return bounds
+
+
+async def query_products(
+    product_id: Optional[str] = None,
+    product_name: Optional[str] = None,
+    category: Optional[str] = None,
+    supplier: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    limit: int = 25,
+) -> list:
+    """
+    Find products. Every argument is optional; the ones given are combined with AND.
+    
+    Args:
+        product_id: Exact product ID, e.g. 'P001'
+        product_name: Exact product name, e.g. 'Smart Watch'
+        category: Exact category, e.g. 'Electronics'
+        supplier: Exact supplier name, e.g. 'Sony'
+        min_price: Lowest price to include
+        max_price: Highest price to include
+        min_rating: Lowest rating to include, e.g. 4.0
+        in_stock: True for products with stock left, False for sold-out products
+        limit: Maximum number of products to return (1-100, default 25)
+    
+    Returns:
+        A list of matching products with their common fields.
+    """
+    query = {}
+    for field, value in (('product_id', product_id), ('product_name', product_name),
+                         ('category', category), ('supplier', supplier)):
+        if value is not None:
+            query[field] = value
+    if min_price is not None or max_price is not None:
+        query['price'] = _range(min_price, max_price)
+    if min_rating is not None:
+        query['rating'] = {'$gte': min_rating}
+    if in_stock is not None:
+        query['stock_count'] = {'$gt': 0} if in_stock else {'$lte': 0}
+    return await db_access('products', query, limit=limit)
+
+
+async def query_suppliers(
+    supplier_id: Optional[str] = None,
+    supplier_name: Optional[str] = None,
+    location: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    limit: int = 25,
+) -> list:
+    """
+    Find suppliers. Every argument is optional; the ones given are combined with AND.
+    
+    Args:
+        supplier_id: Exact supplier ID, e.g. 'S001'
+        supplier_name: Exact supplier name, e.g. 'Sony'
+        location: A word from the address such as a city or country, e.g. 'Mumbai'
+        min_rating: Lowest rating to include, e.g. 4.5
+        limit: Maximum number of suppliers to return (1-100, default 25)
+    
+    Returns:
+        A list of matching suppliers with their contact details.
+    """
+    query = {}
+    if supplier_id is not None:
+        query['supplier_id'] = supplier_id
+    if supplier_name is not None:
+        query['supplier_name'] = supplier_name
+    if location is not None:
+        query['$text'] = {'$search': location}
+    if min_rating is not None:
+        query['rating'] = {'$gte': min_rating}
+    return await db_access('suppliers', query, limit=limit)
+
+
+async def query_orders(
+    order_id: Optional[str] = None,
+    product_id: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_total: Optional[float] = None,
+    limit: int = 25,
+) -> list:
+    """
+    Find orders. Every argument is optional; the ones given are combined with AND.
+    
+    Args:
+        order_id: Exact order ID, e.g. 'O1001'
+        product_id: Exact product ID, e.g. 'P001'
+        customer_name: Exact customer name, e.g. 'Rakesh'
+        date_from: Earliest order date to include, 'YYYY-MM-DD'
+        date_to: Latest order date to include, 'YYYY-MM-DD'
+        min_total: Lowest total_price to include
+        limit: Maximum number of orders to return (1-100, default 25)
+    
+    Returns:
+        A list of matching orders.
+    """
+    query = {}
+    for field, value in (('order_id', order_id), ('product_id', product_id),
+                         ('customer_name', customer_name)):
+        if value is not None:
+            query[field] = value
+    if date_from is not None or date_to is not None:
+        query['order_date'] = _range(date_from, date_to)
+    if min_total is not None:
+        query['total_price'] = {'$gte': min_total}
+    return await db_access('orders', query, limit=limit)
+
+
+query_products_tool = FunctionTool(
+    func=query_products,
+    require_confirmation=False
+)
+
+query_suppliers_tool = FunctionTool(
+    func=query_suppliers,
+    require_confirmation=False
+)
+
+query_orders_tool = FunctionTool(
+    func=query_orders,
+    require_confirmation=False
+)
+
+
 # ======================================
 # DB INSERT TOOL
 # ======================================
 
+# Fields the caller must provide (as sets for a single subset check) and the
+# matching error text, plus the prefix of the generated ID
+_REQUIRED_FIELD_NAMES = {
+    'products': ('product_name', 'price', 'stock_count'),
+    'suppliers': ('supplier_name', 'contact_email', 'contact_number', 'address'),
+    'orders': ('product_id', 'quantity', 'price_per_unit', 'customer_name'),
+}
+_REQUIRED_FIELDS = {c: frozenset(fields) for c, fields in _REQUIRED_FIELD_NAMES.items()}
+_REQUIRED_MSG = {c: f"Required: {', '.join(fields)}" for c, fields in _REQUIRED_FIELD_NAMES.items()}
+_ID_PREFIXES = {'products': 'P', 'suppliers': 'S', 'orders': 'O'}
+
+# Empty defaults for optional fields (supplier is optional and left unset)
+_PRODUCT_DEFAULTS = {"category": "", "units_sold_last_month": "", "units_sold_this_month": "", "rating": ""}
+_SUPPLIER_DEFAULTS = {"rating": ""}
+
+# Formatted current date and the local midnight at which it goes stale
+_date_cache = {"expires": 0.0, "s": ""}
+
+
+def _today() -> str:
+    """Return today's date as 'YYYY-MM-DD', formatting it at most once per day"""
+    if time.time() >= _date_cache["expires"]:
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        _date_cache.update(expires=midnight.timestamp(), s=now.strftime('%Y-%m-%d'))
+    return _date_cache["s"]
+
+
+# Collections whose counter has been aligned with existing IDs in this process
+_seeded_counters = set()
+
+
+def _seed_counter(collection: str, prefix: str) -> None:
+    """Start the collection's counter at its highest existing ID (runs once per collection)"""
+    col = _COLLECTIONS[collection]
+    id_field = _ID_FIELDS[collection]
+    # Only IDs shaped like P123 count (the anchored regex is a bounded scan of the
+    # product_id/supplier_id/order_id index); the max is taken numerically, since
+    # 'P999' sorts after 'P1000'. At most 18 digits, so $toLong can't overflow.
+    existing = col.aggregate([
+        {"$match": {id_field: {"$regex": f"^{prefix}\\d{{1,18}}$"}}},
+        {"$group": {"_id": None, "max": {"$max": {"$toLong": {"$substrCP": [f"${id_field}", len(prefix), 20]}}}}},
+    ])
+    last_num = next(iter(existing), {}).get("max") or 0
+    # $max never moves the counter backwards, so concurrent seeding is harmless
+    _db.counters.update_one({"_id": collection}, {"$max": {"seq": last_num}}, upsert=True)
+    _seeded_counters.add(collection)
+
+
+def _reserve_ids(collection: str, prefix: str, count: int) -> list:
+    """Reserve the next `count` IDs for a collection in one atomic increment"""
+    if collection not in _seeded_counters:
+        _seed_counter(collection, prefix)
+    # Atomic increment on the counters collection: one round-trip, race-safe
+    doc = _db.counters.find_one_and_update(
+        {"_id": collection},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        projection={"seq": 1}
+    )
+    return [f"{prefix}{num:03d}" for num in range(doc['seq'] - count + 1, doc['seq'] + 1)]
+
+
 def _generate_id(collection: str, prefix: str) -> str:
     """Generate next available ID for a collection"""
-    col = _db[collection]
-    # Find the highest existing ID
-    existing = col.find({f"{prefix.lower()}_id": {"$regex": f"^{prefix}\\d+$"}}).sort(f"{prefix.lower()}_id", -1).limit(1)
-    try:
-        last_id = list(existing)[0][f"{prefix.lower()}_id"]
-        num = int(last_id[1:]) + 1
-        return f"{prefix}{num:03d}"
-    except (IndexError, KeyError, ValueError):
-        return f"{prefix}001"
+    return _reserve_ids(collection, prefix, 1)[0]
 
 
+def _build_document(collection: str, data: dict, doc_id: str) -> dict:
+    """Fill defaults and auto-generated fields for a document that passed validation"""
+    # Defaults first, then caller data, then generated fields so they always win
+    if collection == 'products':
+        return {**_PRODUCT_DEFAULTS, **data, 'product_id': doc_id, 'added_date': _today()}
+    
+    if collection == 'suppliers':
+        return _with_derived_fields(collection, {**_SUPPLIER_DEFAULTS, **data, 'supplier_id': doc_id})
+    
+    document = {**data, 'order_id': doc_id, 'order_date': _today()}
+    # Calculate total_price
+    if 'total_price' not in document:
+        document['total_price'] = document['quantity'] * document['price_per_unit']
+    return document
+
+
+@_run_in_thread
+@_invalidates_cache
 def db_insert(collection: str, data: dict) -> dict:
     """
     Insert a new document into MongoDB collection with automatic field filling.
@@ -96,72 +1051,24 @@ def db_insert(collection: str, data: dict) -> dict:
     Returns:
         Dictionary with success status and inserted document
     """
-    valid_collections = ['products', 'suppliers', 'orders']
-    if collection not in valid_collections:
-        return {"error": True, "message": f"Invalid collection. Available: {', '.join(valid_collections)}"}
+    if collection not in _VALID:
+        return {"error": True, "message": _VALID_MSG}
     
+    if not data.keys() >= _REQUIRED_FIELDS[collection]:
+        return {
+            "error": True,
+            "message": f"Missing required fields. {_REQUIRED_MSG[collection]}"
+        }
+    
+    document = None
     try:
-        col = _db[collection]
-        document = data.copy()
-        
-        # Auto-fill fields based on collection
-        if collection == 'products':
-            # Required fields: product_name, price, stock_count
-            if not all(k in document for k in ['product_name', 'price', 'stock_count']):
-                return {
-                    "error": True,
-                    "message": "Missing required fields. Required: product_name, price, stock_count"
-                }
-            
-            # Auto-fill fields
-            document['product_id'] = _generate_id('products', 'P')
-            document['added_date'] = datetime.now().strftime('%Y-%m-%d')
-            
-            # Set default empty values
-            if 'category' not in document:
-                document['category'] = ""
-            if 'units_sold_last_month' not in document:
-                document['units_sold_last_month'] = ""
-            if 'units_sold_this_month' not in document:
-                document['units_sold_this_month'] = ""
-            if 'rating' not in document:
-                document['rating'] = ""
-            # supplier is optional, don't set if not provided
-            
-        elif collection == 'suppliers':
-            # Required fields: supplier_name, contact_email, contact_number, address
-            if not all(k in document for k in ['supplier_name', 'contact_email', 'contact_number', 'address']):
-                return {
-                    "error": True,
-                    "message": "Missing required fields. Required: supplier_name, contact_email, contact_number, address"
-                }
-            
-            # Auto-fill fields
-            document['supplier_id'] = _generate_id('suppliers', 'S')
-            
-            # Set default empty values
-            if 'rating' not in document:
-                document['rating'] = ""
-                
-        elif collection == 'orders':
-            # Required fields for orders (you can customize this)
-            if not all(k in document for k in ['product_id', 'quantity', 'price_per_unit', 'customer_name']):
-                return {
-                    "error": True,
-                    "message": "Missing required fields. Required: product_id, quantity, price_per_unit, customer_name"
-                }
-            
-            # Auto-fill fields
-            document['order_id'] = _generate_id('orders', 'O')
-            document['order_date'] = datetime.now().strftime('%Y-%m-%d')
-            
-            # Calculate total_price
-            if 'total_price' not in document:
-                document['total_price'] = document['quantity'] * document['price_per_unit']
+        document = _build_document(collection, data, _generate_id(collection, _ID_PREFIXES[collection]))
         
         # Insert document
-        result = col.insert_one(document)
+        result = _COLLECTIONS[collection].insert_one(document)
         document['_id'] = str(result.inserted_id)
+        if collection == 'products':
+            _product_index.add([document])
         
         return {
             "error": False,
@@ -171,6 +1078,8 @@ def db_insert(collection: str, data: dict) -> dict:
         }
         
     except Exception as e:
+        if collection == 'products' and document is not None:
+            _product_index.changed({document['product_id']})  # It may have been written anyway
         return {
             "error": True,
             "message": f"Insert failed: {str(e)}"
@@ -183,10 +1092,89 @@ insert_tool = FunctionTool(
 )
 
 
+# ======================================
+# DB INSERT MANY TOOL
+# ======================================
+
+@_run_in_thread
+@_invalidates_cache
+def db_insert_many(collection: str, documents: list[dict]) -> dict:
+    """
+    Insert several new documents into a MongoDB collection in one batch.
+    Fields are auto-filled exactly as in db_insert.
+    
+    Args:
+        collection: Collection name ('products', 'suppliers', or 'orders')
+        documents: List of document data, each with the collection's required fields
+    
+    Returns:
+        Dictionary with success status and inserted documents
+    """
+    if collection not in _VALID:
+        return {"error": True, "message": _VALID_MSG}
+    
+    if not documents:
+        return {"error": True, "message": "No documents provided"}
+    
+    # Validate everything up front so a bad document doesn't burn IDs
+    required = _REQUIRED_FIELDS[collection]
+    for i, data in enumerate(documents):
+        if not isinstance(data, dict):
+            return {"error": True, "message": f"Document {i} is not an object"}
+        if not data.keys() >= required:
+            return {
+                "error": True,
+                "message": f"Document {i} is missing required fields. {_REQUIRED_MSG[collection]}"
+            }
+    
+    docs = []
+    try:
+        ids = _reserve_ids(collection, _ID_PREFIXES[collection], len(documents))
+        docs = [_build_document(collection, data, doc_id) for data, doc_id in zip(documents, ids)]
+        
+        # Unordered: the server applies the whole batch and reports per-document failures
+        result = _COLLECTIONS[collection].insert_many(docs, ordered=False)
+        for doc in docs:
+            doc['_id'] = str(doc['_id'])
+        if collection == 'products':
+            _product_index.add(docs)
+        
+        return {
+            "error": False,
+            "success": True,
+            "message": f"Successfully inserted {len(result.inserted_ids)} {collection} document(s)",
+            "documents": docs
+        }
+    
+    except BulkWriteError as e:
+        if collection == 'products':
+            _product_index.changed({doc['product_id'] for doc in docs})  # Re-read whichever went in
+        return {
+            "error": True,
+            "message": f"Inserted {e.details['nInserted']} of {len(documents)} document(s)",
+            "write_errors": [err['errmsg'] for err in e.details['writeErrors']]
+        }
+    except Exception as e:
+        if collection == 'products' and docs:
+            _product_index.changed({doc['product_id'] for doc in docs})
+        return {
+            "error": True,
+            "message": f"Insert failed: {str(e)}"
+        }
+
+
+insert_many_tool = FunctionTool(
+    func=db_insert_many,
+    require_confirmation=False
+)
+
+
 # ======================================
 # DB UPDATE TOOL
 # ======================================
 
+@_run_in_thread
+@_invalidates_cache
 def db_update(collection: str, filter_query: dict, update_data: dict) -> dict:
     """
     Update existing documents in MongoDB collection.
@@ -200,52 +1188,45 @@ def db_update(collection: str, filter_query: dict, update_data: dict) -> dict:
     Returns:
         Dictionary with success status and update result
     """
-    valid_collections = ['products', 'suppliers', 'orders']
-    if collection not in valid_collections:
-        return {"error": True, "message": f"Invalid collection. Available: {', '.join(valid_collections)}"}
+    if collection not in _VALID:
+        return {"error": True, "message": _VALID_MSG}
     
     try:
-        # Verify database connection
-        _db.client.admin.command('ping')
+        col = _DURABLE_COLLECTIONS[collection]
         
-        col = _db[collection]
+        _normalize_id_filter(filter_query)
+
+        # Prepare update operation
+        update_operation = {"$set": _with_derived_fields(collection, update_data)}
         
-        # Helper to convert string _id to ObjectId if needed
-        if '_id' in filter_query and isinstance(filter_query['_id'], str):
-            try:
-                filter_query['_id'] = ObjectId(filter_query['_id'])
-            except:
-                pass  # If it's not a valid ObjectId string, leave it as is
-
-        # Check if documents exist before update
-        existing_before = list(col.find(filter_query))
-        if not existing_before:
+        # Single-document filters: update and read back in one round-trip
+        if _is_single_target(collection, filter_query):
+            document = col.find_one_and_update(
+                filter_query,
+                update_operation,
+                return_document=ReturnDocument.AFTER
+            )
+            if document is None:
+                return {
+                    "error": True,
+                    "message": "No documents found matching the filter query"
+                }
             return {
-                "error": True,
-                "message": "No documents found matching the filter query"
+                "error": False,
+                "success": True,
+                "message": f"Successfully updated 1 document in {collection}",
+                "matched_count": 1,
+                "updated_fields": list(update_data.keys()),
+                "document": document
             }
         
-        # Prepare update operation
-        update_operation = {"$set": update_data}
-        
-        # Perform update - ensure it executes
-        # Use write_concern to ensure the operation is acknowledged
+        # Perform update - the collection's write concern ensures it is acknowledged
         result = col.update_many(
             filter_query, 
             update_operation,
             upsert=False
         )
         
-        # Force acknowledgment - ensure the operation is committed
-        try:
-            _db.client.admin.command('ping')
-        except:
-            pass
-        
-        # Small delay to ensure write is committed
-        import time
-        time.sleep(0.1)
-        
         # Explicitly check the result
         if not hasattr(result, 'modified_count') or not hasattr(result, 'matched_count'):
             return {
@@ -253,6 +1234,12 @@ def db_update(collection: str, filter_query: dict, update_data: dict) -> dict:
                 "message": "Update operation did not return expected result. Operation may not have executed."
             }
         
+        if result.matched_count == 0:
+            return {
+                "error": True,
+                "message": "No documents found matching the filter query"
+            }
+        
         # Verify the update actually happened
         if result.modified_count == 0 and result.matched_count > 0:
             # Documents matched but weren't modified (values might be the same)
@@ -264,9 +1251,6 @@ def db_update(collection: str, filter_query: dict, update_data: dict) -> dict:
                 "modified_count": result.modified_count
             }
         
-        # Verify by checking updated documents
-        updated_docs = list(col.find(filter_query))
-        
         return {
             "error": False,
             "success": True,
@@ -274,7 +1258,7 @@ def db_update(collection: str, filter_query: dict, update_data: dict) -> dict:
             "matched_count": result.matched_count,
             "modified_count": result.modified_count,
             "updated_fields": list(update_data.keys()),
-            "verification": f"Verified: {len(updated_docs)} document(s) now match the query"
+            "verification": f"Verified: {result.matched_count} document(s) matched the filter"
         }
         
     except Exception as e:
@@ -291,10 +1275,82 @@ update_tool = FunctionTool(
 )
 
 
+# ======================================
+# DB BULK UPDATE TOOL
+# ======================================
+
+@_run_in_thread
+@_invalidates_cache
+def db_bulk_update(collection: str, ops: list[dict]) -> dict:
+    """
+    Apply several updates, each with its own filter, in one batch.
+    Requires user confirmation before execution.
+    
+    Args:
+        collection: Collection name ('products', 'suppliers', or 'orders')
+        ops: List of updates, each {'filter': {...}, 'update': {...}} where 'filter'
+             selects one document and 'update' holds the fields to set
+             Example: [{'filter': {'product_id': 'P001'}, 'update': {'price': 1599}},
+                       {'filter': {'product_id': 'P002'}, 'update': {'stock_count': 0}}]
+    
+    Returns:
+        Dictionary with success status and matched/modified counts
+    """
+    if collection not in _VALID:
+        return {"error": True, "message": _VALID_MSG}
+    
+    if not ops:
+        return {"error": True, "message": "No update operations provided"}
+    
+    if not all(isinstance(op, dict) and 'filter' in op and 'update' in op for op in ops):
+        return {"error": True, "message": "Each operation needs a 'filter' and an 'update'"}
+    
+    try:
+        col = _DURABLE_COLLECTIONS[collection]
+        
+        requests = []
+        for op in ops:
+            _normalize_id_filter(op['filter'])
+            requests.append(UpdateOne(op['filter'], {"$set": _with_derived_fields(collection, op['update'])}))
+        
+        # One round-trip for the whole batch; unordered lets the server apply them independently
+        result = col.bulk_write(requests, ordered=False)
+        
+        return {
+            "error": False,
+            "success": True,
+            "message": f"Successfully updated {result.modified_count} document(s) in {collection}",
+            "matched_count": result.matched_count,
+            "modified_count": result.modified_count,
+            "unmatched_count": len(requests) - result.matched_count
+        }
+    
+    except BulkWriteError as e:
+        return {
+            "error": True,
+            "message": f"Bulk update partially failed: {e.details['nModified']} document(s) updated",
+            "write_errors": [err['errmsg'] for err in e.details['writeErrors']]
+        }
+    except Exception as e:
+        return {
+            "error": True,
+            "message": f"Bulk update failed: {str(e)}",
+            "details": f"Error type: {type(e).__name__}"
+        }
+
+
+bulk_update_tool = FunctionTool(
+    func=db_bulk_update,
+    require_confirmation=False  # Disabled to avoid ADK blocking
+)
+
+
 # ======================================
 # DB DELETE TOOL
 # ======================================
 
+@_run_in_thread
+@_invalidates_cache
 def db_delete(collection: str, filter_query: dict) -> dict:
     """
     Delete documents from MongoDB collection.
@@ -307,33 +1363,13 @@ def db_delete(collection: str, filter_query: dict) -> dict:
     Returns:
         Dictionary with success status and delete result
     """
-    valid_collections = ['products', 'suppliers', 'orders']
-    if collection not in valid_collections:
-        return {"error": True, "message": f"Invalid collection. Available: {', '.join(valid_collections)}"}
+    if collection not in _VALID:
+        return {"error": True, "message": _VALID_MSG}
     
     try:
-        # Verify database connection
-        _db.client.admin.command('ping')
-        
-        col = _db[collection]
-        
-        # Helper to convert string _id to ObjectId if needed
-        if '_id' in filter_query and isinstance(filter_query['_id'], str):
-            try:
-                filter_query['_id'] = ObjectId(filter_query['_id'])
-            except:
-                pass  # If it's not a valid ObjectId string, leave it as is
-
-        # Check if documents exist before delete
-        existing_before = list(col.find(filter_query))
-        if not existing_before:
-            return {
-                "error": True,
-                "message": "No documents found matching the filter query"
-            }
+        col = _DURABLE_COLLECTIONS[collection]
         
-        # Store count before deletion for verification
-        count_before = len(existing_before)
+        _normalize_id_filter(filter_query)
         
         # CRITICAL: Perform delete operation - this MUST execute
         # We explicitly call delete_many to ensure the operation happens
@@ -359,38 +1395,11 @@ def db_delete(collection: str, filter_query: dict) -> dict:
                 "message": f"Delete operation returned unexpected result type: {type(result)}. Operation may not have executed."
             }
         
-        # CRITICAL: Force the operation to be acknowledged by MongoDB
-        # This ensures the write is committed to the database
-        try:
-            # Force write acknowledgment by pinging the server
-            _db.client.admin.command('ping')
-        except Exception as e:
-            # Even if ping fails, the delete should still have executed
-            pass
-        
-        # Small delay to ensure write is committed to disk
-        time.sleep(0.2)
-        
-        # Verify the deletion actually happened by querying again
-        existing_after = list(col.find(filter_query))
-        count_after = len(existing_after)
-        
+        # The acknowledged deleted_count is authoritative; no need to query again
         if result.deleted_count == 0:
             return {
                 "error": True,
-                "message": "Delete operation returned 0 deleted documents. No documents were removed.",
-                "matched_before": count_before,
-                "matched_after": count_after
-            }
-        
-        # Double-check by querying again
-        if count_after > 0:
-            return {
-                "error": False,
-                "success": True,
-                "warning": f"Deleted {result.deleted_count} document(s), but {count_after} still match the query",
-                "deleted_count": result.deleted_count,
-                "remaining_count": count_after
+                "message": "No documents found matching the filter query"
             }
         
         return {
@@ -398,7 +1407,7 @@ def db_delete(collection: str, filter_query: dict) -> dict:
             "success": True,
             "message": f"Successfully deleted {result.deleted_count} document(s) from {collection}",
             "deleted_count": result.deleted_count,
-            "verification": f"Verified: {count_before} document(s) before deletion, {count_after} document(s) after deletion"
+            "verification": f"Verified: {result.deleted_count} document(s) deleted"
         }
         
     except Exception as e:
@@ -419,9 +1428,137 @@ delete_tool = FunctionTool(
 # EMAIL TOOL
 # ======================================
 
-def send_email(recipient_email: str, subject: str, message: str) -> dict:
+# SMTP credentials and TLS context are read/built once, not per email
+_SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+_SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+_SSL_CTX = ssl.create_default_context()
+
+# One authenticated SMTP connection shared by all emails, so bursts skip the
+# TCP + TLS handshake and login. It is closed after sitting idle for a while.
+_SMTP_IDLE_SECONDS = 60
+_smtp_lock = threading.Lock()
+_smtp = None
+_smtp_last_used = 0.0
+_smtp_reaper = None
+
+
+def _get_smtp() -> smtplib.SMTP_SSL:
+    """Return the shared SMTP connection, reconnecting if it dropped (caller holds _smtp_lock)"""
+    global _smtp
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                return _smtp
+        except (smtplib.SMTPException, OSError):
+            pass
+        _smtp.close()
+        _smtp = None
+    
+    # Connect to Gmail SMTP server; only share the connection once login succeeded
+    server = smtplib.SMTP_SSL("smtp.gmail.com", 465, context=_SSL_CTX)
+    server.login(_SENDER_EMAIL, _SENDER_PASSWORD)
+    _smtp = server
+    return _smtp
+
+
+def _close_idle_smtp() -> None:
+    """Idle reaper: close the shared connection if nothing used it for _SMTP_IDLE_SECONDS"""
+    global _smtp
+    with _smtp_lock:
+        if _smtp is None or time.monotonic() - _smtp_last_used < _SMTP_IDLE_SECONDS:
+            return
+        try:
+            _smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            _smtp.close()
+        _smtp = None
+
+
+def _touch_smtp() -> None:
+    """Mark the connection as used and restart the idle timer (caller holds _smtp_lock)"""
+    global _smtp_last_used, _smtp_reaper
+    _smtp_last_used = time.monotonic()
+    if _smtp_reaper is not None:
+        _smtp_reaper.cancel()
+    _smtp_reaper = threading.Timer(_SMTP_IDLE_SECONDS, _close_idle_smtp)
+    _smtp_reaper.daemon = True
+    _smtp_reaper.start()
+
+
+def _deliver(msg: EmailMessage) -> None:
+    """Blocking send over the shared SMTP connection"""
+    with _smtp_lock:
+        _get_smtp().send_message(msg)
+        _touch_smtp()
+
+
+# Emails are queued and delivered by a background worker, so the agent can
+# reply as soon as the message is accepted instead of waiting on SMTP.
+# Delivery results are kept (bounded) for check_email_status.
+_EMAIL_STATUS_LIMIT = 1000
+_email_status = OrderedDict()  # tracking id -> status dict
+_email_queue = None
+_email_worker = None
+_email_sending = {}  # tracking id -> recipient, while a worker is delivering it
+
+_INTERRUPTED_MSG = "Delivery was interrupted; the email may not have been sent"
+
+
+def _set_email_status(tracking_id: str, status: dict) -> None:
+    _email_status[tracking_id] = status
+    _email_status.move_to_end(tracking_id)
+    while len(_email_status) > _EMAIL_STATUS_LIMIT:
+        _email_status.popitem(last=False)
+
+
+async def _email_loop(queue: asyncio.Queue) -> None:
+    while True:
+        tracking_id, msg = await queue.get()
+        _email_sending[tracking_id] = msg["To"]
+        try:
+            await asyncio.to_thread(_deliver, msg)
+            _set_email_status(tracking_id, {"status": "sent", "recipient": msg["To"]})
+        except asyncio.CancelledError:
+            # The event loop is shutting down mid-delivery
+            _set_email_status(tracking_id, {"status": "failed", "recipient": msg["To"], "message": _INTERRUPTED_MSG})
+            raise
+        except Exception as e:
+            _set_email_status(tracking_id, {
+                "status": "failed",
+                "recipient": msg["To"],
+                "message": f"Failed to send email: {str(e)}"
+            })
+        finally:
+            _email_sending.pop(tracking_id, None)
+            queue.task_done()
+
+
+def _email_queue_for_loop() -> asyncio.Queue:
+    """Return the queue, (re)starting the worker on the running event loop if needed"""
+    global _email_queue, _email_worker
+    loop = asyncio.get_running_loop()
+    if _email_worker is not None and not _email_worker.done() and _email_worker.get_loop() is loop:
+        return _email_queue
+    
+    old_queue, old_worker = _email_queue, _email_worker
+    _email_queue = asyncio.Queue()
+    _email_worker = loop.create_task(_email_loop(_email_queue))
+    
+    # A worker whose loop has stopped will never get to its backlog: carry the
+    # queued emails over, and mark the one it was delivering as interrupted
+    if old_worker is not None and (old_worker.done() or not old_worker.get_loop().is_running()):
+        while not old_queue.empty():
+            _email_queue.put_nowait(old_queue.get_nowait())
+        for tracking_id, recipient in list(_email_sending.items()):
+            _email_sending.pop(tracking_id, None)
+            _set_email_status(tracking_id, {"status": "failed", "recipient": recipient, "message": _INTERRUPTED_MSG})
+    return _email_queue
+
+
+async def send_email(recipient_email: str, subject: str, message: str) -> dict:
     """
-    Send an email to a recipient using SMTP (Gmail).
+    Queue an email to a recipient for delivery via SMTP (Gmail).
+    Returns as soon as the email is queued; delivery happens in the background.
     
     Args:
         recipient_email: The email address of the recipient
@@ -429,35 +1566,32 @@ def send_email(recipient_email: str, subject: str, message: str) -> dict:
         message: The body of the email
     
     Returns:
-        Dictionary with success status
+        Dictionary with queued status and a tracking_id for check_email_status
     """
     try:
-        # Get credentials from environment variables
-        sender_email = os.getenv("SENDER_EMAIL")
-        password = os.getenv("SENDER_PASSWORD")
-        
-        if not sender_email or not password or "your_email" in sender_email:
+        if not _SENDER_EMAIL or not _SENDER_PASSWORD or "your_email" in _SENDER_EMAIL:
             return {
                 "error": True,
                 "message": "Email credentials not configured. Please set SENDER_EMAIL and SENDER_PASSWORD in .env file."
             }
 
-        # Create secure SSL context
-        context = ssl.create_default_context()
+        # Structured headers handle Unicode and reject header injection
+        msg = EmailMessage()
+        msg["From"] = _SENDER_EMAIL
+        msg["To"] = recipient_email
+        msg["Subject"] = subject
+        msg.set_content(message)
         
-        # Connect to Gmail SMTP server
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(sender_email, password)
-            
-            # Format email
-            email_content = f"Subject: {subject}\n\n{message}"
-            
-            server.sendmail(sender_email, recipient_email, email_content)
+        tracking_id = uuid.uuid4().hex[:12]
+        _set_email_status(tracking_id, {"status": "queued", "recipient": recipient_email})
+        _email_queue_for_loop().put_nowait((tracking_id, msg))
         
         return {
             "error": False,
             "success": True,
-            "message": f"Email successfully sent to {recipient_email}"
+            "status": "queued",
+            "tracking_id": tracking_id,
+            "message": f"Email to {recipient_email} queued for delivery"
         }
     except Exception as e:
         return {
@@ -472,293 +1606,255 @@ email_tool = FunctionTool(
 )
 
 
+def check_email_status(tracking_id: str) -> dict:
+    """
+    Check whether a queued email has been delivered.
+    
+    Args:
+        tracking_id: The tracking_id returned by send_email
+    
+    Returns:
+        Dictionary with status 'queued', 'sent' or 'failed'
+    """
+    status = _email_status.get(tracking_id)
+    if status is None:
+        return {"error": True, "message": f"Unknown tracking ID: {tracking_id}"}
+    return {"error": status["status"] == "failed", "tracking_id": tracking_id, **status}
+
+
+email_status_tool = FunctionTool(
+    func=check_email_status,
+    require_confirmation=False
+)
+
+
+# ======================================
+# MEMORY
+# ======================================
+
+# A short digest of what the user said in earlier sessions is kept in user
+# state and injected at the end of the instruction. It is rebuilt after every
+# turn into `user:memory_digest_next` but only promoted to the injected key when
+# a new session starts, so the instruction (and its context cache) stays the
+# same for the whole session. Entries are newest first, and each is quoted and
+# stripped of characters that could open a template variable or close the
+# block it is injected into.
+_DIGEST_KEY = "user:memory_digest"
+_NEXT_DIGEST_KEY = "user:memory_digest_next"
+_DIGEST_MAX_CHARS = 2000  # ~500 tokens
+_DIGEST_LINE_CHARS = 160
+_DIGEST_UNSAFE = re.compile(r'[{}<>"`]')
+
+
+def _digest_line(content) -> str:
+    """One quoted digest entry for a user message, or '' if it has no text"""
+    text = " ".join(part.text for part in content.parts or () if part.text)
+    text = " ".join(_DIGEST_UNSAFE.sub("", text).split())
+    return f'- "{text[:_DIGEST_LINE_CHARS]}"' if text else ""
+
+
+def _fit_digest(lines: list) -> str:
+    """Join newest-first lines, dropping the oldest ones past the budget"""
+    kept, size = [], 0
+    for line in lines:
+        size += len(line) + 1
+        if size > _DIGEST_MAX_CHARS:
+            break
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _update_digest(state, session) -> None:
+    lines = [line for line in (state.get(_NEXT_DIGEST_KEY) or state.get(_DIGEST_KEY) or "").splitlines() if line]
+    for event in session.events:
+        if event.author != "user" or not event.content:
+            continue
+        line = _digest_line(event.content)
+        if not line:
+            continue
+        if line in lines:
+            lines.remove(line)
+        lines.insert(0, line)
+    
+    digest = _fit_digest(lines)
+    if digest != state.get(_NEXT_DIGEST_KEY):
+        state[_NEXT_DIGEST_KEY] = digest
+
+
+async def _load_memory_digest(callback_context) -> None:
+    """
+    Before the first turn of a session, promote the digest built during earlier
+    sessions. If the session service kept no user state (e.g. in-memory
+    sessions), seed it once from the memory service instead, searching with the
+    session's first message.
+    """
+    state = callback_context.state
+    if state.get("memory_digest_loaded"):
+        return None
+    state["memory_digest_loaded"] = True  # Session-scoped, so this runs once per session
+    digest = state.get(_NEXT_DIGEST_KEY)
+    if digest is None:
+        digest = await _seed_digest(callback_context)
+    if digest and digest != state.get(_DIGEST_KEY):
+        state[_DIGEST_KEY] = digest
+    return None
+
+
+async def _seed_digest(callback_context) -> str:
+    ctx = callback_context._invocation_context
+    query = callback_context.user_content
+    if ctx.memory_service is None or query is None:
+        return ""
+    query_text = " ".join(part.text for part in query.parts or () if part.text)
+    if not query_text:
+        return ""
+    try:
+        response = await ctx.memory_service.search_memory(
+            app_name=ctx.session.app_name, user_id=ctx.session.user_id, query=query_text
+        )
+    except Exception:
+        return ""  # Memory unavailable; load_memory can still be tried later
+    memories = [m for m in response.memories if m.author == "user" and m.content]
+    memories.sort(key=lambda m: m.timestamp or "", reverse=True)
+    lines = []
+    for memory in memories:
+        line = _digest_line(memory.content)
+        if line and line not in lines:
+            lines.append(line)
+    return _fit_digest(lines)
+
+
+async def _save_session_to_memory(callback_context) -> None:
+    """After each turn, hand the session to the memory service so later turns can recall it,
+    and fold the user's messages into the next session's memory digest"""
+    ctx = callback_context._invocation_context
+    if ctx.memory_service is not None:
+        try:
+            await ctx.memory_service.add_session_to_memory(ctx.session)
+        except Exception:
+            # The answer is already produced; a memory outage shouldn't fail the turn
+            _log.exception("Saving session %s to memory failed", ctx.session.id)
+    _update_digest(callback_context.state, ctx.session)
+
+
+# ======================================
+# MODEL ROUTING
+# ======================================
+
+# Turns that start from a user message only need to pick tools and build the
+# query, which the small model does quickly; once tool results are in, the
+# answer is phrased by the larger model.
+#
+# Gemini context caches are per model, and ADK's cache fingerprint includes the
+# model, so switching models between the calls of a turn would stop the cache
+# from ever being created (or send a cache built for one model with the other).
+# The two are therefore exclusive: by default the agent uses ANSWER_MODEL for
+# every call with context caching on; MODEL_ROUTING=1 turns routing on and
+# context caching off.
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "").lower() in ("1", "true", "yes")
+ROUTER_MODEL = os.getenv("ROUTER_MODEL", "gemini-2.5-flash-lite")
+ANSWER_MODEL = os.getenv("ANSWER_MODEL", "gemini-2.5-flash")
+
+
+def _route_model(callback_context, llm_request):
+    """before_model_callback (MODEL_ROUTING only): choose the model for this LLM call from what it has to do"""
+    last = llm_request.contents[-1] if llm_request.contents else None
+    has_results = last is not None and any(part.function_response for part in last.parts or ())
+    llm_request.model = ANSWER_MODEL if has_results else ROUTER_MODEL
+    return None
+
+
+# ======================================
+# PROMPTS
+# ======================================
+
+@functools.lru_cache(maxsize=None)
+def _load_prompt(name: str) -> str:
+    """Read a prompt file from prompts/ (cached, so each file is read once per process)"""
+    return (Path(__file__).parent / "prompts" / name).read_text(encoding="utf-8")
+
+
+DESCRIPTION = _load_prompt("root_description.txt")
+
+# The instruction is a static prefix (schemas, rules, examples) followed by the
+# memory guidance, which is the part expected to change. Keeping the prefix
+# byte-identical across turns is what lets Gemini reuse its cached prefill.
+STATIC_PREFIX = _load_prompt("root_instruction.txt")
+DYNAMIC_SUFFIX = _load_prompt("root_memory.txt")
+INSTRUCTION = STATIC_PREFIX + DYNAMIC_SUFFIX
+
+
 # ======================================
 # ROOT AGENT
 # ======================================
 
-root_agent = Agent(
-    model="gemini-2.5-flash",
-    name="root_agent",
-
-    description=(
-        "You manage and answer questions about products, suppliers, and orders using MongoDB.\n"
-        "You have access to three collections in the 'user_db' database:\n"
-        "- 'products': Product information (name, price, category, stock, sales, rating, supplier, etc.)\n"
-        "- 'suppliers': Supplier information (name, contact, address, rating, etc.)\n"
-        "- 'orders': Order information (order ID, product ID, quantity, price, customer, date, etc.)\n"
-        "\n"
-        "DATABASE OPERATIONS:\n"
-        "- db_access: Query/read data from collections\n"
-        "- db_insert: Create new documents (auto-fills required fields)\n"
-        "- db_update: Update existing documents (requires confirmation)\n"
-        "- db_delete: Delete documents (requires confirmation)\n"
-        "- send_email: Send emails to suppliers/customers\n"
-        "\n"
-        "CONTEXT ENGINEERING:\n"
-        "- You have access to memory tools to maintain conversation context across sessions\n"
-        "- Use load_memory to retrieve previous conversation context\n"
-        "- Use preload_memory to store important information for future conversations\n"
-        "- Sessions are automatically managed - each user has their own conversation history\n"
-        "\n"
-        "Workflow:\n"
-        "1) Load memory to retrieve previous context\n"
-        "2) Analyze user request → Identify operation (read/create/update/delete)\n"
-        "3) Execute appropriate database operation\n"
-        "4) Convert results → natural language answer\n"
-        "5) Store important information in memory for future reference\n"
-    ),
-
-    instruction=(
-        "=== DATABASE STRUCTURE ===\n"
-        "Database: 'user_db'\n"
-        "Available Collections: 'products', 'suppliers', 'orders'\n"
-        "\n"
-        "=== COLLECTION SCHEMAS ===\n"
-        "\n"
-        "1. PRODUCTS COLLECTION:\n"
-        "Each product document contains:\n"
-        "{\n"
-        "  'product_id': string (e.g., 'P001'),\n"
-        "  'product_name': string (e.g., 'Bluetooth Speaker'),\n"
-        "  'category': string (e.g., 'Electronics'),\n"
-        "  'price': number (e.g., 1499),\n"
-        "  'stock_count': number (e.g., 80),\n"
-        "  'units_sold_last_month': number (e.g., 320),\n"
-        "  'units_sold_this_month': number (e.g., 210),\n"
-        "  'rating': number (e.g., 4.5),\n"
-        "  'supplier': string (e.g., 'Sony'),\n"
-        "  'added_date': string in format 'YYYY-MM-DD' (e.g., '2023-05-10')\n"
-        "}\n"
-        "\n"
-        "2. SUPPLIERS COLLECTION:\n"
-        "Each supplier document contains:\n"
-        "{\n"
-        "  'supplier_id': string (e.g., 'S001'),\n"
-        "  'supplier_name': string (e.g., 'Sony'),\n"
-        "  'contact_email': string (e.g., 'sony.support@gmail.com'),\n"
-        "  'contact_number': string (e.g., '9876543210'),\n"
-        "  'address': string (e.g., 'Mumbai, India'),\n"
-        "  'rating': number (e.g., 4.6)\n"
-        "}\n"
-        "\n"
-        "3. ORDERS COLLECTION:\n"
-        "Each order document contains:\n"
-        "{\n"
-        "  'order_id': string (e.g., 'O1001'),\n"
-        "  'product_id': string (e.g., 'P001'),\n"
-        "  'quantity': number (e.g., 2),\n"
-        "  'price_per_unit': number (e.g., 1499),\n"
-        "  'total_price': number (e.g., 2998),\n"
-        "  'order_date': string in format 'YYYY-MM-DD' (e.g., '2023-10-10'),\n"
-        "  'customer_name': string (e.g., 'Rakesh')\n"
-        "}\n"
-        "\n"
-        "=== CONTEXT ENGINEERING & MEMORY MANAGEMENT ===\n"
-        "\n"
-        "SESSION MANAGEMENT:\n"
-        "- Each user has their own session with automatic conversation history\n"
-        "- Sessions persist across multiple interactions\n"
-        "- Previous messages in the same session are automatically available as context\n"
-        "\n"
-        "MEMORY TOOLS:\n"
-        "1. load_memory: Retrieves stored information from previous conversations\n"
-        "   - Use this at the start of conversations to get context\n"
-        "   - Example: Call load_memory() to retrieve user preferences or previous queries\n"
-        "   - Use when user asks follow-up questions or references previous information\n"
-        "\n"
-        "2. preload_memory: Stores important information for future conversations\n"
-        "   - Use this to save key information that might be useful later\n"
-        "   - Example: Store user preferences, frequently asked products, or important facts\n"
-        "   - Format: preload_memory(content='User prefers products under 2000 rupees')\n"
-        "\n"
-        "CONTEXT AWARENESS:\n"
-        "- If user asks follow-up questions (e.g., 'What about its price?'), use previous context\n"
-        "- If user references something mentioned earlier, use load_memory to retrieve it\n"
-        "- Store important facts about the user or their preferences using preload_memory\n"
-        "\n"
-        "=== OPERATION RULES ===\n"
-        "1. MANDATORY: ALWAYS call load_memory() FIRST at the start of EVERY conversation to check for stored context.\n"
-        "   - This retrieves any previously stored information about the user or conversation\n"
-        "   - Even if it's the first message, call load_memory() to check for any stored preferences\n"
-        "   - Example: load_memory() - no parameters needed\n"
-        "2. Read the user's request carefully and identify the operation type:\n"
-        "   - READ/QUERY: User asks questions or wants to see data → use db_access\n"
-        "   - CREATE/INSERT: User wants to add new product/supplier/order → use db_insert\n"
-        "   - UPDATE: User wants to modify existing data → use db_update (requires confirmation)\n"
-        "   - DELETE: User wants to remove data → use db_delete (requires confirmation)\n"
-        "3. Identify which collection(s) to work with:\n"
-        "   - Products → 'products' collection\n"
-        "   - Suppliers/vendors → 'suppliers' collection\n"
-        "   - Orders/purchases → 'orders' collection\n"
-        "\n"
-        "=== DB_ACCESS (READ/QUERY) ===\n"
-        "4. For queries, construct a valid MongoDB query using the appropriate field names.\n"
-        "5. IMPORTANT: You MUST actually CALL the db_access tool (do not just output text about calling it).\n"
-        "   - The tool takes two parameters: 'collection' (string) and 'query' (dict)\n"
-        "   - Use MongoDB query operators like $gt, $lt, $gte, $lte, $in, $regex for filtering\n"
-        "\n"
-        "=== DB_INSERT (CREATE) ===\n"
-        "6. For creating new documents, use db_insert tool with required fields:\n"
-        "   PRODUCTS - Required fields:\n"
-        "     - product_name (required)\n"
-        "     - price (required)\n"
-        "     - stock_count (required)\n"
-        "     - supplier (optional, ask user but not required)\n"
-        "   Auto-filled fields (you don't need to provide):\n"
-        "     - product_id (auto-generated: P001, P002, etc.)\n"
-        "     - added_date (auto-filled with current date)\n"
-        "     - category (default: empty string)\n"
-        "     - units_sold_last_month (default: empty string)\n"
-        "     - units_sold_this_month (default: empty string)\n"
-        "     - rating (default: empty string)\n"
-        "   Example: db_insert(collection='products', data={'product_name': 'New Product', 'price': 1999, 'stock_count': 50})\n"
-        "\n"
-        "   SUPPLIERS - Required fields:\n"
-        "     - supplier_name (required)\n"
-        "     - contact_email (required)\n"
-        "     - contact_number (required)\n"
-        "     - address (required)\n"
-        "   Auto-filled fields:\n"
-        "     - supplier_id (auto-generated: S001, S002, etc.)\n"
-        "     - rating (default: empty string)\n"
-        "   Example: db_insert(collection='suppliers', data={'supplier_name': 'New Supplier', 'contact_email': 'email@example.com', 'contact_number': '1234567890', 'address': 'City, Country'})\n"
-        "\n"
-        "   ORDERS - Required fields:\n"
-        "     - product_id (required)\n"
-        "     - quantity (required)\n"
-        "     - price_per_unit (required)\n"
-        "     - customer_name (required)\n"
-        "   Auto-filled fields:\n"
-        "     - order_id (auto-generated: O001, O002, etc.)\n"
-        "     - order_date (auto-filled with current date)\n"
-        "     - total_price (auto-calculated: quantity * price_per_unit)\n"
-        "\n"
-        "=== DB_UPDATE (UPDATE) ===\n"
-        "7. For updating documents, use db_update tool:\n"
-        "   - This tool REQUIRES USER CONFIRMATION before execution\n"
-        "   - Parameters: collection, filter_query (to find documents), update_data (fields to update)\n"
-        "   - Example: db_update(collection='products', filter_query={'product_id': 'P001'}, update_data={'price': 1599, 'stock_count': 100})\n"
-        "   - Always confirm with user before calling this tool\n"
-        "\n"
-        "=== DB_DELETE (DELETE) ===\n"
-        "8. For deleting documents, use db_delete tool:\n"
-        "   - This tool REQUIRES USER CONFIRMATION before execution\n"
-        "   - Parameters: collection, filter_query (to find documents to delete)\n"
-        "   - Example: db_delete(collection='products', filter_query={'product_id': 'P001'})\n"
-        "   - Always confirm with user before calling this tool\n"
-        "   - Show what will be deleted before confirming\n"
-        "\n"
-        "=== EXAMPLE OPERATIONS ===\n"
-        "\n"
-        "READ/QUERY EXAMPLES (db_access):\n"
-        "PRODUCTS:\n"
-        "- Find by name: db_access(collection='products', query={'product_name': 'Smart Watch'})\n"
-        "- Find by category: db_access(collection='products', query={'category': 'Electronics'})\n"
-        "- Find by price range: db_access(collection='products', query={'price': {'$lt': 2000}})\n"
-        "- Find by rating: db_access(collection='products', query={'rating': {'$gte': 4.0}})\n"
-        "- Find by supplier: db_access(collection='products', query={'supplier': 'Sony'})\n"
-        "- Find best sellers: db_access(collection='products', query={'units_sold_last_month': {'$gt': 500}})\n"
-        "\n"
-        "SUPPLIERS:\n"
-        "- Find by name: db_access(collection='suppliers', query={'supplier_name': 'Sony'})\n"
-        "- Find by ID: db_access(collection='suppliers', query={'supplier_id': 'S001'})\n"
-        "- Find high-rated suppliers: db_access(collection='suppliers', query={'rating': {'$gte': 4.5}})\n"
-        "- Find by location: db_access(collection='suppliers', query={'address': {'$regex': 'Mumbai', '$options': 'i'}})\n"
-        "\n"
-        "ORDERS:\n"
-        "- Find by order ID: db_access(collection='orders', query={'order_id': 'O1001'})\n"
-        "- Find by customer: db_access(collection='orders', query={'customer_name': 'Rakesh'})\n"
-        "- Find by product: db_access(collection='orders', query={'product_id': 'P001'})\n"
-        "- Find by date range: db_access(collection='orders', query={'order_date': {'$gte': '2023-10-01', '$lte': '2023-10-31'}})\n"
-        "- Find high-value orders: db_access(collection='orders', query={'total_price': {'$gt': 5000}})\n"
-        "\n"
-        "CREATE/INSERT EXAMPLES (db_insert):\n"
-        "PRODUCTS:\n"
-        "- Create product: db_insert(collection='products', data={'product_name': 'New Laptop', 'price': 45000, 'stock_count': 25})\n"
-        "- Create product with supplier: db_insert(collection='products', data={'product_name': 'New Laptop', 'price': 45000, 'stock_count': 25, 'supplier': 'Sony'})\n"
-        "  Note: product_id and added_date are auto-generated, other fields default to empty strings\n"
-        "\n"
-        "SUPPLIERS:\n"
-        "- Create supplier: db_insert(collection='suppliers', data={'supplier_name': 'Tech Corp', 'contact_email': 'tech@example.com', 'contact_number': '9876543210', 'address': 'Delhi, India'})\n"
-        "  Note: supplier_id is auto-generated, rating defaults to empty string\n"
-        "\n"
-        "ORDERS:\n"
-        "- Create order: db_insert(collection='orders', data={'product_id': 'P001', 'quantity': 2, 'price_per_unit': 1499, 'customer_name': 'John'})\n"
-        "  Note: order_id and order_date are auto-generated, total_price is auto-calculated\n"
-        "\n"
-        "UPDATE EXAMPLES (db_update - requires confirmation):\n"
-        "- Update product price: db_update(collection='products', filter_query={'product_id': 'P001'}, update_data={'price': 1599})\n"
-        "- Update multiple fields: db_update(collection='products', filter_query={'product_id': 'P001'}, update_data={'price': 1599, 'stock_count': 100, 'rating': 4.5})\n"
-        "- Update supplier: db_update(collection='suppliers', filter_query={'supplier_id': 'S001'}, update_data={'rating': 4.8, 'contact_number': '9999999999'})\n"
-        "  IMPORTANT: Always confirm with user before calling db_update\n"
-        "\n"
-        "DELETE EXAMPLES (db_delete - requires confirmation):\n"
-        "- Delete product: db_delete(collection='products', filter_query={'product_id': 'P001'})\n"
-        "- Delete supplier: db_delete(collection='suppliers', filter_query={'supplier_id': 'S001'})\n"
-        "- Delete order: db_delete(collection='orders', filter_query={'order_id': 'O1001'})\n"
-        "- Delete order: db_delete(collection='orders', filter_query={'order_id': 'O1001'})\n"
-        "  IMPORTANT: Always confirm with user and show what will be deleted before calling db_delete\n"
-        "\n"
-        "=== EMAIL OPERATIONS ===\n"
-        "9. To send an email to a supplier:\n"
-        "   Step 1: Find the supplier's email using db_access (if not already known).\n"
-        "   Step 2: Ask user for the subject and message body (if not provided).\n"
-        "   Step 3: Show the draft (To, Subject, Message) to the user and ASK FOR CONFIRMATION.\n"
-        "   Step 4: ONLY after user says 'yes', call send_email(recipient_email, subject, message).\n"
-        "\n"
-        "=== RESPONSE GUIDELINES ===\n"
-        "9. After the tool returns results, process the JSON data and convert it into a clear, natural language answer.\n"
-        "10. Include relevant details based on the collection:\n"
-        "   - Products: names, prices, ratings, stock counts, units sold, categories, suppliers\n"
-        "   - Suppliers: names, contact info, addresses, ratings\n"
-        "   - Orders: order IDs, product IDs, quantities, prices, customer names, dates\n"
-        "11. If the question requires data from multiple collections, make multiple db_access calls.\n"
-        "12. For INSERT operations: Confirm what was created and show the auto-generated ID.\n"
-        "13. For UPDATE operations: Show what was changed and how many documents were updated.\n"
-        "14. For DELETE operations: Show what was deleted and how many documents were removed.\n"
-        "15. MANDATORY: ALWAYS call preload_memory() AFTER answering to store important information.\n"
-        "   - Store the product name, customer name, or any key information from the query\n"
-        "   - Store user preferences or patterns you notice\n"
-        "   - Examples:\n"
-        "     * preload_memory(content='User asked about product: Smart Watch')\n"
-        "     * preload_memory(content='User asked about customer: Rakesh')\n"
-        "     * preload_memory(content='User prefers products under 2000 rupees')\n"
-        "     * preload_memory(content='User is interested in Electronics category')\n"
-        "   - This ensures context is available for future conversations\n"
-        "16. If the question doesn't require database access, answer normally without calling any database tools, but still call load_memory() and preload_memory().\n"
-        "\n"
-        "=== MEMORY USAGE EXAMPLES ===\n"
-        "Scenario 1: User asks 'What is the price of Smart Watch?'\n"
-        "  Step 1: ALWAYS call load_memory() first (mandatory)\n"
-        "  Step 2: Query products collection using db_access\n"
-        "  Step 3: Answer the question\n"
-        "  Step 4: ALWAYS call preload_memory(content='User asked about product: Smart Watch') (mandatory)\n"
-        "\n"
-        "Scenario 2: User later asks 'What about its rating?' (follow-up question)\n"
-        "  Step 1: ALWAYS call load_memory() first - this retrieves 'User asked about product: Smart Watch'\n"
-        "  Step 2: Use the context from memory to know 'its' refers to Smart Watch\n"
-        "  Step 3: Query products collection for Smart Watch rating\n"
-        "  Step 4: Answer the question\n"
-        "  Step 5: ALWAYS call preload_memory(content='User asked about Smart Watch rating') (mandatory)\n"
-        "\n"
-        "Scenario 3: User asks about products under 2000 rupees\n"
-        "  Step 1: ALWAYS call load_memory() first\n"
-        "  Step 2: Query products collection\n"
-        "  Step 3: Answer the question\n"
-        "  Step 4: ALWAYS call preload_memory(content='User prefers products under 2000 rupees') (mandatory)\n"
-        "  - Next time: load_memory() will retrieve this preference automatically\n"
-    ),
-
-    tools=[
+# Every tool the agent exposes, by name. Importing this does not build the agent.
+TOOL_REGISTRY = {
+    t.name: t
+    for t in (
+        query_products_tool,
+        query_suppliers_tool,
+        query_orders_tool,
         db_tool,
         insert_tool,
+        insert_many_tool,
         update_tool,
+        bulk_update_tool,
         delete_tool,
         email_tool,
+        email_status_tool,
         load_memory,
-        preload_memory,
-    ],
-)
+    )
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_root_agent():
+    """Build the root agent on first use (cached, so it is built once per process)"""
+    return Agent(
+        model=ANSWER_MODEL,
+        name="root_agent",
+
+        description=DESCRIPTION,
+
+        instruction=INSTRUCTION,
+
+        tools=list(TOOL_REGISTRY.values()),
+
+        before_agent_callback=_load_memory_digest,
+        before_model_callback=_route_model if MODEL_ROUTING else None,
+        after_agent_callback=_save_session_to_memory,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_app():
+    """Wrap the root agent in an App with explicit Gemini context caching of the
+    system instruction and tool declarations, refreshed every `cache_intervals`
+    invocations or on change (off under MODEL_ROUTING, see above)"""
+    if App is None:
+        return None
+    if MODEL_ROUTING:
+        return App(name="user_question_answer", root_agent=get_root_agent())
+    return App(
+        name="user_question_answer",
+        root_agent=get_root_agent(),
+        context_cache_config=ContextCacheConfig(
+            min_tokens=2048,
+            ttl_seconds=1800,
+            cache_intervals=10,
+        ),
+    )
+
+
+def __getattr__(name):
+    # `root_agent` and `app` stay importable (adk web, main.py) but are only
+    # built when first accessed
+    if name == "root_agent":
+        return get_root_agent()
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 
@@ -766,7 +1862,7 @@ root_agent = Agent(
 #please note that ,
 
 #load_memory() — retrieves stored information from previous conversations
-#preload_memory() — stores information for future conversations
+#user:memory_digest — what the user said in earlier sessions, injected at the end of the instruction
 #DESCRIPTION — "Who the agent is"
 #It answers:
 
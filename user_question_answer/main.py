@@ -1,4 +1,82 @@
-from agent import root_agent
+import asyncio
+import os
+from pathlib import Path
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent import get_app, root_agent
+from memory import SqliteMemoryService
+
+APP_NAME = "user_question_answer"
+USER_ID = "user"
+
+# Sessions (and the user-scoped state holding the memory digest) persist
+# across runs, so each new session starts with what earlier ones learned.
+# Needs the async SQLite driver from `pip install "google-adk[db]"`.
+_SESSION_DB = Path.home() / ".cache" / "user_question_answer" / "sessions.db"
+
+
+def _session_service():
+    """SQLite-backed sessions when the [db] extra is installed, otherwise in-memory
+    (the memory digest is then seeded from the memory service each session)"""
+    try:
+        from google.adk.sessions import DatabaseSessionService
+        
+        _SESSION_DB.parent.mkdir(parents=True, exist_ok=True)
+        return DatabaseSessionService(db_url=os.getenv("SESSION_DB_URL", f"sqlite+aiosqlite:///{_SESSION_DB}"))
+    except (ImportError, ValueError) as e:
+        print(f"Session persistence unavailable ({e}); using in-memory sessions")
+        return InMemorySessionService()
+
+# SSE streaming: the model's reply arrives as partial events, so text is
+# printed as soon as the first tokens are generated instead of at the end.
+_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+
+def _text(event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text or "" for part in event.content.parts)
+
+
+async def main():
+    # Run through the App so its ContextCacheConfig applies; ADK releases
+    # without App support get the bare agent
+    app = get_app()
+    target = {"app": app} if app is not None else {"agent": root_agent, "app_name": APP_NAME}
+    runner = Runner(
+        **target,
+        session_service=_session_service(),
+        memory_service=SqliteMemoryService(),
+    )
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+    
+    while True:
+        user_input = await asyncio.to_thread(input, "You: ")
+        if user_input.strip().lower() in ("exit", "quit"):
+            break
+        
+        message = types.Content(role="user", parts=[types.Part(text=user_input)])
+        print("Agent: ", end="", flush=True)
+        streamed = False
+        async for event in runner.run_async(
+            user_id=USER_ID, session_id=session.id, new_message=message, run_config=_RUN_CONFIG
+        ):
+            if event.partial:
+                chunk = _text(event)
+                print(chunk, end="", flush=True)
+                streamed = streamed or bool(chunk)
+            elif event.is_final_response() and not streamed:
+                # Models that don't stream only send the aggregated final event
+                print(_text(event), end="", flush=True)
+            else:
+                # The aggregated copy of text we already streamed
+                streamed = False
+        print()
+
 
 if __name__ == "__main__":
-    root_agent.run()
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+# memory.py
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from google.adk.memory import BaseMemoryService
+from google.adk.memory.base_memory_service import SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.genai import types
+
+
+_DEFAULT_PATH = Path.home() / ".cache" / "user_question_answer" / "memory.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    author TEXT,
+    ts REAL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_user ON events (app_name, user_id, ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(text);
+"""
+
+
+def _event_text(content: types.Content) -> str:
+    return " ".join(part.text for part in content.parts or () if part.text)
+
+
+def _match_expression(query: str) -> str:
+    """FTS5 MATCH expression for free text: any of its words, quoted so punctuation can't break the syntax"""
+    words = re.findall(r"\w+", query.lower())
+    return " OR ".join(f'"{word}"' for word in dict.fromkeys(words))
+
+
+class SqliteMemoryService(BaseMemoryService):
+    """
+    Memory service backed by a local SQLite database with an FTS5 index, so
+    load_memory searches are answered on this machine instead
+    of with a remote call per turn.
+
+    An optional `remote` memory service acts as a cold tier: sessions are
+    written to it in the background (write-behind), and it is only searched
+    when nothing matches locally, with its results cached locally.
+    """
+
+    def __init__(self, path=None, remote: BaseMemoryService = None, max_results: int = 10):
+        path = Path(path or os.getenv("MEMORY_DB_PATH") or _DEFAULT_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()  # One connection shared by the worker threads
+        self._remote = remote
+        self._max_results = max_results
+        self._flushes = set()
+
+    # ----- local tier (blocking, run in worker threads) -----
+
+    def _store(self, app_name: str, user_id: str, rows: list) -> None:
+        """rows: (event_id, author, ts, content); already-stored events are skipped"""
+        with self._lock, self._conn:
+            for event_id, author, ts, content in rows:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                    (event_id, app_name, user_id, author, ts, content.model_dump_json(exclude_none=True)),
+                )
+                if cur.rowcount:
+                    self._conn.execute(
+                        "INSERT INTO events_fts (rowid, text) VALUES (?, ?)",
+                        (cur.lastrowid, _event_text(content)),
+                    )
+
+    def _search(self, app_name: str, user_id: str, query: str) -> list:
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT e.author, e.ts, e.content
+                FROM events_fts JOIN events e ON e.rowid = events_fts.rowid
+                WHERE events_fts MATCH ? AND e.app_name = ? AND e.user_id = ?
+                ORDER BY bm25(events_fts)
+                LIMIT ?
+                """,
+                (expression, app_name, user_id, self._max_results),
+            ).fetchall()
+        return [
+            MemoryEntry(
+                content=types.Content.model_validate_json(content),
+                author=author,
+                timestamp=datetime.fromtimestamp(ts).isoformat() if ts else None,
+            )
+            for author, ts, content in rows
+        ]
+
+    # ----- BaseMemoryService -----
+
+    async def add_session_to_memory(self, session) -> None:
+        rows = [
+            (event.id, event.author, event.timestamp, event.content)
+            for event in session.events
+            if event.content and _event_text(event.content)
+        ]
+        if rows:
+            await asyncio.to_thread(self._store, session.app_name, session.user_id, rows)
+        if self._remote is not None:
+            task = asyncio.ensure_future(self._flush(session))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, session) -> None:
+        try:
+            await self._remote.add_session_to_memory(session)
+        except Exception:
+            pass  # Best effort: the local tier already has the session
+
+    async def search_memory(self, *, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        memories = await asyncio.to_thread(self._search, app_name, user_id, query)
+        if memories or self._remote is None:
+            return SearchMemoryResponse(memories=memories)
+
+        response = await self._remote.search_memory(app_name=app_name, user_id=user_id, query=query)
+        rows = []
+        for memory in response.memories:
+            if memory.content and _event_text(memory.content):
+                key = hashlib.sha1(memory.content.model_dump_json().encode()).hexdigest()
+                try:
+                    ts = datetime.fromisoformat(memory.timestamp).timestamp()
+                except (TypeError, ValueError):
+                    ts = None
+                # Scoped to the user: event_id is a global key, and two users can
+                # share identical remote content
+                rows.append((f"remote:{app_name}/{user_id}:{key}", memory.author, ts, memory.content))
+        if rows:
+            await asyncio.to_thread(self._store, app_name, user_id, rows)
+        return response
@@ -1,10 +1,16 @@
-from agent import root_agent
+from agent import TOOL_REGISTRY
 
 print("Verifying root_agent tools...")
-tool_names = [t.name for t in root_agent.tools]
-print(f"Tool names: {tool_names}")
+print(f"Tool names: {list(TOOL_REGISTRY)}")
 
-if "preload_memory" in tool_names:
-    print("SUCCESS: preload_memory is in the tools list.")
+if "load_memory" in TOOL_REGISTRY:
+    print("SUCCESS: load_memory is in the tools list.")
 else:
-    print("FAILURE: preload_memory is MISSING from the tools list.")
+    print("FAILURE: load_memory is MISSING from the tools list.")
+
+# Memories from earlier sessions come from the user:memory_digest instruction
+# suffix; preload_memory would re-inject them every turn and defeat the cache
+if "preload_memory" not in TOOL_REGISTRY:
+    print("SUCCESS: preload_memory is not attached.")
+else:
+    print("FAILURE: preload_memory is attached; it should be replaced by the memory digest.")